@@ -16,8 +16,8 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 def main():
     """Run the PDF QA application."""
     # Import here to ensure the path is set up correctly
-    from src.app import PDFQAApp
-    app = PDFQAApp()
+    from src.app import get_app
+    app = get_app()
     app.run()
 
 if __name__ == "__main__":
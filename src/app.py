@@ -1,10 +1,7 @@
 import os
+import hashlib
 import streamlit as st
 from dotenv import load_dotenv
-from src.tasks.loader import DocumentLoader
-from src.tasks.embeddings import EmbeddingManager
-from src.tasks.together_ai import TogetherAIManager
-from src.pipelines.qa_chain import QAChain
 
 # Load environment variables
 load_dotenv()
@@ -13,8 +10,20 @@ class PDFQAApp:
     """Streamlit application for PDF question answering."""
 
     def __init__(self):
-        """Initialize the application."""
+        """
+        Initialize the application.
+
+        The instance is shared across Streamlit reruns and sessions (see
+        get_app), so per-session state is set up in run() instead.
+        """
         try:
+            # Imported here so the LangChain/FAISS stack is only loaded when
+            # the cached application is first built
+            from src.tasks.loader import DocumentLoader
+            from src.tasks.embeddings import EmbeddingManager
+            from src.tasks.together_ai import TogetherAIManager
+            from src.pipelines.qa_chain import QAChain
+
             # Initialize Together.ai for LLM and embeddings
             self.together_ai = TogetherAIManager()
 
@@ -22,13 +31,12 @@ class PDFQAApp:
             llm = self.together_ai.get_llm()
 
             # Initialize components
-            self.doc_loader = DocumentLoader()
             self.embedding_manager = EmbeddingManager()
-            self.qa_chain = QAChain(llm=llm)
-
-            # Set up session state
-            if "conversation" not in st.session_state:
-                st.session_state.conversation = None
+            # Chunks are limited to the embedding model's input length
+            self.doc_loader = DocumentLoader(embeddings=self.embedding_manager.embeddings)
+            # Rerank over-fetched candidates by exact cosine similarity
+            # (RERANK_K=0 disables it)
+            self.qa_chain = QAChain(llm=llm, rerank_k=int(os.getenv("RERANK_K", "4")) or None)
 
             self.error = None
 
@@ -71,7 +79,8 @@ class PDFQAApp:
 
             # Embedding info
             if hasattr(self, 'embedding_manager') and hasattr(self.embedding_manager, 'model_name'):
-                st.info(f"Embeddings: {self.embedding_manager.model_name} (Together.ai)")
+                source = "local ONNX" if self.embedding_manager.backend == "local" else "Together.ai"
+                st.info(f"Embeddings: {self.embedding_manager.model_name} ({source})")
             else:
                 st.info(f"Embeddings: {os.getenv('TOGETHER_EMBEDDING_MODEL')} (Together.ai)")
 
@@ -89,21 +98,28 @@ class PDFQAApp:
                 type=["pdf", "txt", "docx", "csv", "xlsx", "pptx", "html"]
             )
 
-            if uploaded_file is not None:
+            # Every rerun (e.g. each chat message) re-submits the uploaded
+            # file, so only process it when a different file is uploaded
+            if uploaded_file is not None and uploaded_file.file_id != st.session_state.get("processed_file_id"):
                 with st.spinner("Processing document..."):
                     # Get file extension
                     file_extension = os.path.splitext(uploaded_file.name)[1].lower()
 
-                    # Save the uploaded file to a temp location
+                    # Save the uploaded file to a temp location, hashing its
+                    # content so re-uploads reuse the cached index
                     temp_file_path = os.path.join(f"temp_uploaded{file_extension}")
-                    with open(temp_file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
+                    document_hash = self._save_upload(uploaded_file, temp_file_path)
 
                     # Load and process the document
                     documents = self.doc_loader.load_document(temp_file_path)
 
                     # Process the documents
-                    self._process_documents(documents, f"Document '{uploaded_file.name}'")
+                    self._process_documents(
+                        documents,
+                        f"Document '{uploaded_file.name}'",
+                        cache_key=document_hash
+                    )
+                    st.session_state.processed_file_id = uploaded_file.file_id
 
         with url_tab:
             url = st.text_input("🔗 Enter a URL to a document or webpage:")
@@ -132,7 +148,35 @@ class PDFQAApp:
                     # Process the documents
                     self._process_documents(documents, "User-provided text")
 
-    def _process_documents(self, documents, source_description):
+        # Add option to start over with a new set of documents
+        if st.session_state.get("vectorstore") is not None and st.button("🗑️ Clear Documents"):
+            st.session_state.vectorstore = None
+            st.session_state.conversation = None
+            st.session_state.chat_history = []
+            st.session_state.pop("processed_file_id", None)
+            st.experimental_rerun()
+
+    def _save_upload(self, uploaded_file, path, chunk_size=1024 * 1024):
+        """
+        Stream an uploaded file to disk in fixed-size chunks.
+
+        Args:
+            uploaded_file: Streamlit UploadedFile
+            path: Destination path
+            chunk_size: Number of bytes copied per chunk
+
+        Returns:
+            SHA-256 hex digest of the file content
+        """
+        digest = hashlib.sha256()
+        uploaded_file.seek(0)
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: uploaded_file.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    def _process_documents(self, documents, source_description, cache_key=None):
         """Process documents and create conversation chain."""
         if not documents:
             st.error("No content found in the document.")
@@ -146,19 +190,27 @@ class PDFQAApp:
         st.write("**Content Preview:**")
         st.write(content_preview)
 
-        # Split documents and create vector store
-        split_docs = self.doc_loader.split_documents(documents)
-        vectorstore = self.embedding_manager.create_vector_store(split_docs)
-
-        # Store in session state
-        if "vectorstore" not in st.session_state:
-            st.session_state.vectorstore = vectorstore
+        # Split documents; uploads share source names (the temporary upload
+        # file, "user_input"), so chunk ids continue after the chunks already
+        # in the store to keep the retrieval order key unique
+        vectorstore = st.session_state.get("vectorstore")
+        start_id = vectorstore.index.ntotal if vectorstore is not None else 0
+        split_docs = self.doc_loader.split_documents(documents, start_id=start_id)
+
+        if vectorstore is not None:
+            # Extend the session's index with the new chunks only; the
+            # existing chain's retriever searches the same index, so the
+            # conversation carries on over all loaded documents
+            self.embedding_manager.add_documents(vectorstore, split_docs)
         else:
+            vectorstore = self.embedding_manager.create_vector_store(split_docs, cache_key=cache_key)
             st.session_state.vectorstore = vectorstore
 
-        # Create conversation chain
-        conversation_chain = self.qa_chain.create_chain(vectorstore)
-        st.session_state.conversation = conversation_chain
+            # Create conversation chain; it lives in the session state, so a
+            # new store (e.g. after "Clear Documents") always gets a new chain
+            # with fresh memory
+            conversation_chain = self.qa_chain.create_chain(vectorstore)
+            st.session_state.conversation = conversation_chain
 
         st.success(f"{source_description} processed successfully!")
 
@@ -218,6 +270,10 @@ class PDFQAApp:
 
     def run(self):
         """Run the application."""
+        # Set up session state
+        if "conversation" not in st.session_state:
+            st.session_state.conversation = None
+
         # Setup UI and check for initialization errors
         if self.setup_ui():
             # Add app description
@@ -261,7 +317,12 @@ class PDFQAApp:
             3. Restart the application after updating the key
             """)
 
+@st.cache_resource(show_spinner=False)
+def get_app():
+    """Build the application once and reuse it across Streamlit reruns."""
+    return PDFQAApp()
+
 # Example usage
 if __name__ == "__main__":
-    app = PDFQAApp()
+    app = get_app()
     app.run()
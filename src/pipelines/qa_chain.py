@@ -1,11 +1,145 @@
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain_core.prompts import PromptTemplate
+from typing import Any, ClassVar, List
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.prompts import StringPromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from src.tasks.rerank import cosine_topk
+
+class StableOrderRetriever(BaseRetriever):
+    """
+    Retriever that returns the retrieved chunks in document order.
+
+    Similarity order changes from question to question, which changes the
+    prompt prefix and defeats the model server's prefix (KV) cache. Sorting
+    the chunks by source and ``chunk_id`` keeps shared context in the same
+    position across turns. ``chunk_id`` is unique within a store (see
+    DocumentLoader.split_documents), so the order is total even when
+    uploads share a source name.
+    """
+
+    retriever: BaseRetriever
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        docs = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return sorted(
+            docs,
+            key=lambda d: (str(d.metadata.get("source", "")), d.metadata.get("chunk_id", 0))
+        )
+
+class CosineRerankRetriever(BaseRetriever):
+    """
+    Retriever that over-fetches from a FAISS store and keeps the closest chunks.
+
+    The question is embedded once and used both to search the index for
+    ``fetch_k`` candidates and to rank them by exact cosine similarity,
+    keeping the best ``k``. Candidate vectors are taken from the embedding
+    model's chunk cache, which holds the full-precision embeddings, and
+    otherwise reconstructed from the index, so reranking never calls the
+    embedding model for the candidates. With quantized indexes (ivfpq, sq8)
+    the cached vectors correct the approximate index ranking.
+    """
+
+    vectorstore: Any
+    k: int = 4
+    fetch_k: int = 20
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        store = self.vectorstore
+        query_vec = np.asarray(store.embeddings.embed_query(query), dtype=np.float32)
+
+        search_vec = query_vec.reshape(1, -1).copy()
+        if store._normalize_L2:
+            faiss.normalize_L2(search_vec)
+        _, positions = store.index.search(search_vec, self.fetch_k)
+        positions = [int(p) for p in positions[0] if p != -1]
+        if not positions:
+            return []
+
+        docs = [store.docstore.search(store.index_to_docstore_id[p]) for p in positions]
+        vectors = self._candidate_vectors(docs, positions)
+        top, _ = cosine_topk(query_vec, vectors, self.k)
+        return [docs[i] for i in top]
+
+    def _candidate_vectors(self, docs, positions):
+        """
+        Collect the vectors of the candidate chunks.
+
+        Args:
+            docs: Candidate Document objects
+            positions: Positions of the candidates in the index
+
+        Returns:
+            (N, d) float32 array of candidate vectors
+        """
+        store = self.vectorstore
+        vectors = np.empty((len(docs), store.index.d), dtype=np.float32)
+
+        embeddings = store.embeddings
+        if hasattr(embeddings, "cached_embeddings_into"):
+            missing = embeddings.cached_embeddings_into([doc.page_content for doc in docs], vectors)
+        else:
+            missing = range(len(docs))
+
+        for i in missing:
+            vectors[i] = self._reconstruct(positions[i])
+        return vectors
+
+    def _reconstruct(self, position):
+        """Reconstruct the stored vector at an index position."""
+        index = self.vectorstore.index
+        try:
+            return index.reconstruct(position)
+        except RuntimeError:
+            # IVF indexes need a direct map from ids to list entries
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is None:
+                raise
+            ivf.make_direct_map()
+            return index.reconstruct(position)
+
+class QAPromptTemplate(StringPromptTemplate):
+    """
+    Question-answering prompt rendered by plain string concatenation.
+
+    The fixed text around the two variables is precomputed, so formatting
+    skips template parsing and the prompt prefix stays byte-identical across
+    turns for the model server's prefix cache.
+    """
+
+    PREFIX: ClassVar[str] = (
+        "You are an expert assistant. Use the following document content "
+        "to answer the user's question.\n\nContent:\n"
+    )
+    MIDDLE: ClassVar[str] = "\n\nQuestion: "
+    SUFFIX: ClassVar[str] = "\nAnswer:"
+
+    input_variables: List[str] = ["context", "question"]
+
+    def format(self, **kwargs: Any) -> str:
+        return self.PREFIX + kwargs["context"] + self.MIDDLE + kwargs["question"] + self.SUFFIX
+
+    @property
+    def _prompt_type(self) -> str:
+        return "qa-concat"
 
 class QAChain:
     """Class for creating and managing question-answering chains."""
 
-    def __init__(self, llm=None, temperature=0.7, max_output_tokens=2048, memory_k=5):
+    def __init__(
+        self,
+        llm=None,
+        temperature=0.7,
+        max_output_tokens=2048,
+        memory_k=5,
+        rerank_k=None,
+        fetch_k=20,
+    ):
         """
         Initialize with model parameters.
 
@@ -14,29 +148,27 @@ class QAChain:
             temperature: Temperature for text generation
             max_output_tokens: Maximum number of tokens to generate
             memory_k: Number of conversation turns to keep in memory
+            rerank_k: If set, retrieve fetch_k chunks and keep the rerank_k
+                      with the highest exact cosine similarity to the question
+            fetch_k: Number of candidate chunks retrieved for reranking
         """
         self.llm = llm  # Will be set by the caller if None
         self.temperature = temperature
         self.max_output_tokens = max_output_tokens
         self.memory_k = memory_k
+        self.rerank_k = rerank_k
+        self.fetch_k = fetch_k
 
         if self.llm:
             print("Language model provided externally")
         else:
             print("Warning: No language model provided. Make sure to set it before creating a chain.")
 
-        # Initialize memory
-        self.memory = ConversationBufferWindowMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            k=self.memory_k
-        )
+        # Memory of the most recently created chain
+        self.memory = None
 
         # Define prompt template
-        self.prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
-            template="You are an expert assistant. Use the following document content to answer the user's question.\n\nContent: {context}\n\nQuestion: {question}\nAnswer:"
-        )
+        self.prompt_template = QAPromptTemplate()
 
     def create_chain(self, vectorstore):
         """
@@ -48,11 +180,40 @@ class QAChain:
         Returns:
             ConversationalRetrievalChain
         """
+        # Imported lazily: langchain's chain modules are slow to import and
+        # are only needed once a document has been processed
+        from langchain.chains import ConversationalRetrievalChain
+        from langchain.memory import ConversationBufferWindowMemory
+
+        # Each chain gets its own memory so conversations never leak between
+        # chains created by a shared QAChain
+        self.memory = ConversationBufferWindowMemory(
+            memory_key="chat_history",
+            return_messages=True,
+            k=self.memory_k
+        )
+
+        if self.rerank_k:
+            retriever = StableOrderRetriever(
+                retriever=CosineRerankRetriever(
+                    vectorstore=vectorstore,
+                    k=self.rerank_k,
+                    fetch_k=self.fetch_k
+                )
+            )
+        else:
+            retriever = StableOrderRetriever(
+                retriever=vectorstore.as_retriever(search_type="similarity")
+            )
+
         conversation_chain = ConversationalRetrievalChain.from_llm(
             llm=self.llm,
-            retriever=vectorstore.as_retriever(search_type="similarity"),
+            retriever=retriever,
             memory=self.memory,
-            combine_docs_chain_kwargs={"prompt": self.prompt_template}
+            combine_docs_chain_kwargs={
+                "prompt": self.prompt_template,
+                "document_separator": "\n\n"
+            }
         )
 
         return conversation_chain
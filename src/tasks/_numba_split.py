@@ -0,0 +1,159 @@
+"""
+Fast character-based text splitting with a JIT-compiled delimiter scan.
+"""
+
+import numpy as np
+from src.tasks.documents import SlimDoc
+try:
+    # JIT-compile the scanning loop when numba is installed
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Split preferably at line breaks, then at spaces
+DEFAULT_DELIMITERS = ("\n", " ")
+
+
+def _scan_split_points(data, chunk_size, overlap, delims, out):
+    """
+    Scan code points for chunk boundaries.
+
+    Each chunk ends after the last delimiter in the second half of its
+    window, trying delimiters in priority order, and is cut hard at
+    chunk_size when none is found. The next chunk starts about overlap code
+    points before the previous end, moved forward to a delimiter boundary
+    (possibly the end itself, i.e. no overlap) so words are not cut.
+
+    Args:
+        data: (N,) uint32 array of code points
+        chunk_size: Maximum chunk length in code points
+        overlap: Number of code points shared by consecutive chunks
+        delims: Delimiter code points in priority order
+        out: (M, 2) int64 array receiving (start, end) pairs; only the
+             first M chunks are written, so an empty array just counts them
+
+    Returns:
+        Number of chunks
+    """
+    n = data.shape[0]
+    count = 0
+    start = 0
+    while start < n:
+        end = min(start + chunk_size, n)
+        if end < n:
+            floor = start + chunk_size // 2
+            cut = -1
+            for d in range(delims.shape[0]):
+                for i in range(end - 1, floor - 1, -1):
+                    if data[i] == delims[d]:
+                        cut = i + 1
+                        break
+                if cut != -1:
+                    break
+            if cut != -1:
+                end = cut
+
+        if count < out.shape[0]:
+            out[count, 0] = start
+            out[count, 1] = end
+        count += 1
+        if end >= n:
+            break
+
+        next_start = max(end - overlap, start + 1)
+        for i in range(next_start, end + 1):
+            found = False
+            for d in range(delims.shape[0]):
+                if data[i - 1] == delims[d]:
+                    found = True
+                    break
+            if found:
+                next_start = i
+                break
+        start = next_start
+    return count
+
+
+if njit is not None:
+    _scan_split_points = njit(cache=True)(_scan_split_points)
+
+
+def _find_split_points(data, chunk_size, overlap, delims):
+    """
+    Find the (start, end) code point offsets of the chunks of a text.
+
+    Args:
+        data: (N,) uint32 array of code points
+        chunk_size: Maximum chunk length in code points
+        overlap: Number of code points shared by consecutive chunks
+        delims: (K,) uint32 array of delimiter code points in priority order
+
+    Returns:
+        (M, 2) int64 array of chunk offsets
+    """
+    count = _scan_split_points(data, chunk_size, overlap, delims, np.empty((0, 2), dtype=np.int64))
+    out = np.empty((count, 2), dtype=np.int64)
+    _scan_split_points(data, chunk_size, overlap, delims, out)
+    return out
+
+
+class FastCharSplitter:
+    """
+    Character-count text splitter for very large documents.
+
+    A drop-in replacement for RecursiveCharacterTextSplitter.split_documents
+    that finds all chunk boundaries of a document in a single compiled scan
+    instead of recursive Python-level splitting. Boundaries are simpler:
+    chunks end at a line break or space where possible.
+    """
+
+    def __init__(self, chunk_size=500, chunk_overlap=50, delimiters=DEFAULT_DELIMITERS):
+        """
+        Initialize with text splitting parameters.
+
+        Args:
+            chunk_size: Maximum number of characters per chunk
+            chunk_overlap: Number of characters shared by consecutive chunks
+            delimiters: Single-character delimiters in priority order
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._delims = np.array([ord(d) for d in delimiters], dtype=np.uint32)
+
+    def split_text(self, text):
+        """
+        Split a text into chunks.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List of non-empty, whitespace-stripped chunks
+        """
+        # UTF-32 gives one array element per character, so the offsets
+        # found by the scan index the Python string directly
+        data = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        chunks = []
+        for start, end in _find_split_points(data, self.chunk_size, self.chunk_overlap, self._delims):
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def split_documents(self, documents):
+        """
+        Split documents into chunks.
+
+        Args:
+            documents: List of Document objects
+
+        Returns:
+            List of SlimDoc records, each with a copy of its source metadata
+        """
+        return [
+            SlimDoc(chunk, dict(doc.metadata))
+            for doc in documents
+            for chunk in self.split_text(doc.page_content)
+        ]
@@ -0,0 +1,59 @@
+"""
+Lightweight document records.
+"""
+
+from langchain_core.documents import Document
+
+
+class SlimDoc:
+    """
+    Minimal chunk record that duck-types as a LangChain Document.
+
+    Documents are pydantic models with a per-instance __dict__ and
+    validation on construction; SlimDoc stores the same fields in __slots__,
+    which makes large lists of chunks cheaper to build, hold and iterate.
+    Code that needs a real Document (e.g. a vector store's docstore) should
+    call to_document().
+    """
+
+    __slots__ = ("page_content", "metadata", "id")
+
+    type = "Document"
+
+    def __init__(self, page_content, metadata=None, id=None):
+        """
+        Initialize a document record.
+
+        Args:
+            page_content: Text of the document
+            metadata: Optional metadata dictionary
+            id: Optional document identifier
+        """
+        self.page_content = page_content
+        self.metadata = {} if metadata is None else metadata
+        self.id = id
+
+    def to_document(self):
+        """Return the record as a LangChain Document."""
+        return Document(page_content=self.page_content, metadata=self.metadata, id=self.id)
+
+    def __eq__(self, other):
+        if not isinstance(other, (SlimDoc, Document)):
+            return NotImplemented
+        return self.page_content == other.page_content and self.metadata == other.metadata
+
+    def __repr__(self):
+        return f"SlimDoc(page_content={self.page_content!r}, metadata={self.metadata!r})"
+
+
+def as_document(doc):
+    """
+    Convert a SlimDoc to a LangChain Document, leaving Documents unchanged.
+
+    Args:
+        doc: Document or SlimDoc
+
+    Returns:
+        Document
+    """
+    return doc if isinstance(doc, Document) else doc.to_document()
@@ -1,18 +1,210 @@
 """
-Together.ai embeddings implementation for LangChain.
+Together.ai and local ONNX embeddings implementations for LangChain.
 """
 
 import os
+import sys
+import abc
+import platform
+import time
+import asyncio
+import hashlib
+import math
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from dotenv import load_dotenv
 from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+import faiss
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from src.tasks.documents import as_document
+from src.tasks.tokenization import DEFAULT_TOKENIZER, get_tokenizer
+try:
+    # Persistent per-chunk embedding cache, used when diskcache is installed
+    import diskcache
+except ImportError:
+    diskcache = None
+try:
+    # Async HTTP/2 client, used to multiplex batches over one connection;
+    # httpx is often installed without the h2 package it needs for that
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+# libuv-based event loop for the async embedding client (not on Windows)
+uvloop = None
+if sys.platform != "win32":
+    try:
+        import uvloop
+    except ImportError:
+        pass
 
 # Load environment variables
 load_dotenv()
 
-class TogetherEmbeddings(Embeddings):
+# Vectors are L2-normalized and ranked by inner product (cosine similarity);
+# LangChain warns about that combination even though it is intended here
+warnings.filterwarnings("ignore", message="Normalizing L2 is not applicable", category=UserWarning)
+
+# Maximum number of vectors used to train quantizing FAISS indexes
+TRAINING_SAMPLE_SIZE = 65536
+
+# Embedding models shared by all EmbeddingManager instances, keyed by
+# backend and configuration so each model is only loaded once per process
+_EMBEDDINGS_CACHE = {}
+_EMBEDDINGS_LOCK = threading.Lock()
+
+def _shared_embeddings(key, factory):
+    """
+    Return the embeddings cached under key, creating them on first use.
+
+    Args:
+        key: Hashable cache key identifying the backend and its configuration
+        factory: Callable creating the embeddings
+
+    Returns:
+        Embeddings instance
+    """
+    with _EMBEDDINGS_LOCK:
+        embeddings = _EMBEDDINGS_CACHE.get(key)
+        if embeddings is None:
+            embeddings = _EMBEDDINGS_CACHE[key] = factory()
+        return embeddings
+
+def _run_async(coro):
+    """Run a coroutine to completion on a new uvloop or asyncio event loop."""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+def _cpu_has_flag(flag: str) -> bool:
+    """Return whether /proc/cpuinfo lists a CPU feature flag (Linux only)."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            return flag in f.read().split()
+    except OSError:
+        return False
+
+def _event_loop_running() -> bool:
+    """Return whether an asyncio event loop is running in this thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+class _ChunkCachedEmbeddings(Embeddings):
+    """
+    Base class for embeddings with a persistent per-chunk cache.
+
+    Subclasses set ``dimensions``, ``_cache`` (a diskcache.Cache or None) and
+    ``_cache_namespace`` (identifying the model producing the vectors), and
+    implement ``_embed_uncached``.
+    """
+
+    _cache = None
+
+    def _cache_key(self, text: str) -> str:
+        """Return the embedding cache key for a text under the current model."""
+        return hashlib.sha1((self._cache_namespace + "\0" + text).encode()).hexdigest()
+
+    @abc.abstractmethod
+    def _embed_uncached(self, texts: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Embed texts without consulting the cache."""
+
+    def _fill_cached(self, texts: List[str], out: np.ndarray):
+        """
+        Copy cached embeddings into their rows of out.
+
+        Args:
+            texts: List of texts to embed
+            out: (N, d) float32 array to write the embeddings into
+
+        Returns:
+            Tuple of (cache keys, indices of texts missing from the cache)
+        """
+        keys = [self._cache_key(text) for text in texts]
+        misses = []
+        for i, key in enumerate(keys):
+            embedding = self._cache.get(key)
+            if embedding is None:
+                misses.append(i)
+            else:
+                out[i] = embedding
+        return keys, misses
+
+    def cached_embeddings_into(self, texts: List[str], out: np.ndarray) -> List[int]:
+        """
+        Copy the cached embeddings of texts into out, without embedding any.
+
+        Args:
+            texts: List of texts
+            out: (N, d) float32 array to write the cached embeddings into
+
+        Returns:
+            Indices of the texts missing from the cache (rows left unwritten)
+        """
+        if self._cache is None:
+            return list(range(len(texts)))
+        return self._fill_cached(texts, out)[1]
+
+    def _store_cached(self, keys, misses, out: np.ndarray):
+        """Cache the freshly computed rows of out."""
+        for i in misses:
+            self._cache.set(keys[i], out[i])
+
+    def embed_documents_into(self, texts: List[str], out: np.ndarray) -> np.ndarray:
+        """
+        Embed a list of documents into a preallocated array.
+
+        Embeddings already in the chunk cache are reused; only the remaining
+        texts are embedded.
+
+        Args:
+            texts: List of texts to embed
+            out: (N, d) float32 array to write the embeddings into
+
+        Returns:
+            out
+        """
+        if self._cache is None:
+            return self._embed_uncached(texts, out)
+
+        keys, misses = self._fill_cached(texts, out)
+        if len(misses) == len(texts):
+            self._embed_uncached(texts, out)
+        elif misses:
+            out[misses] = self._embed_uncached([texts[i] for i in misses])
+        self._store_cached(keys, misses, out)
+
+        return out
+
+    def embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed a list of documents.
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            List of float32 embedding arrays
+        """
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        return list(self.embed_documents_into(texts, out))
+
+class TogetherEmbeddings(_ChunkCachedEmbeddings):
     """Together.ai embeddings implementation for LangChain."""
 
     def __init__(
@@ -20,6 +212,11 @@ class TogetherEmbeddings(Embeddings):
         model_name: str = "togethercomputer/m2-bert-80M-8k-retrieval",
         api_key: Optional[str] = None,
         dimensions: int = 768,
+        batch_size: int = 96,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        cache_dir: Optional[str] = ".embed_cache",
+        max_tokens: int = 8000,
     ):
         """
         Initialize Together.ai embeddings.
@@ -28,18 +225,137 @@ class TogetherEmbeddings(Embeddings):
             model_name: Name of the embedding model to use
             api_key: Together.ai API key
             dimensions: Dimensions of the embeddings
+            batch_size: Maximum number of texts sent per API request
+            max_workers: Maximum number of batches embedded concurrently
+            max_retries: Number of retries when the API responds with HTTP 429
+            cache_dir: Directory for the per-chunk embedding cache (None disables it)
+            max_tokens: Longest input the model embeds without truncation
         """
         self.model_name = model_name
+        # Used by DocumentLoader to keep chunks within the model's input
+        self.tokenizer_name = DEFAULT_TOKENIZER
+        self.max_tokens = max_tokens
         self.api_key = api_key or os.getenv("TOGETHER_API_KEY")
         if not self.api_key:
             raise ValueError("TOGETHER_API_KEY not found in environment variables or parameters")
 
         self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
         self.base_url = "https://api.together.xyz/v1/embeddings"
 
+        # Reuse one keep-alive connection pool for all requests, sized so that
+        # every worker thread can hold its own connection
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self._session.mount("https://", adapter)
+
+        # Identical chunks (headers, boilerplate, unchanged paragraphs of a
+        # revised document) are served from disk instead of the API
+        self._cache = diskcache.Cache(cache_dir) if cache_dir and diskcache else None
+        self._cache_namespace = self.model_name
+
         print(f"Using Together.ai embedding model: {self.model_name}")
 
-    def _get_embedding(self, text: str) -> List[float]:
+    def _parse_response(self, response, num_texts: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Extract the embeddings from a Together.ai API response.
+
+        Args:
+            response: HTTP response from the embeddings endpoint
+            num_texts: Number of texts sent in the request
+            out: Optional (N, d) float32 array to write the embeddings into
+
+        Returns:
+            (N, d) float32 array of embeddings, in the same order as the input texts
+        """
+        if response.status_code != 200:
+            raise ValueError(f"Error from Together.ai API: {response.text}")
+
+        # orjson parses the large float arrays much faster than stdlib json
+        data = orjson.loads(response.content)["data"]
+
+        # Every row of out must be written, or uninitialized memory would be
+        # indexed (and cached) as embeddings
+        if len(data) != num_texts:
+            raise ValueError(f"Together.ai API returned {len(data)} embeddings for {num_texts} texts")
+        if {d["index"] for d in data} != set(range(num_texts)):
+            raise ValueError("Together.ai API returned duplicate or out-of-range embedding indices")
+
+        if out is None:
+            out = np.empty((num_texts, self.dimensions), dtype=np.float32)
+        if data and len(data[0]["embedding"]) != out.shape[1]:
+            raise ValueError(
+                f"{self.model_name} returned {len(data[0]['embedding'])}-dimensional "
+                f"embeddings, expected {out.shape[1]}; set dimensions accordingly"
+            )
+
+        # Each embedding is tagged with the position of its input text and is
+        # converted straight into its float32 row, with no intermediate list
+        for d in data:
+            out[d["index"]] = d["embedding"]
+        return out
+
+    def _get_embeddings_batch(self, texts: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get embeddings for a batch of texts in a single API request.
+
+        Args:
+            texts: Texts to embed
+            out: Optional (N, d) float32 array to write the embeddings into
+
+        Returns:
+            (N, d) float32 array of embeddings, in the same order as the input texts
+        """
+        data = orjson.dumps({
+            "model": self.model_name,
+            "input": texts
+        })
+
+        # Back off exponentially while the API reports rate limiting
+        for attempt in range(self.max_retries + 1):
+            response = self._session.post(self.base_url, data=data)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            time.sleep(2 ** attempt)
+
+        return self._parse_response(response, len(texts), out)
+
+    async def _aget_embeddings_batch(
+        self, client, semaphore, texts: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Asynchronously get embeddings for a batch of texts.
+
+        Args:
+            client: httpx.AsyncClient shared by all batches of the current call
+            semaphore: Semaphore bounding the number of in-flight requests
+            texts: Texts to embed
+            out: Optional (N, d) float32 array to write the embeddings into
+
+        Returns:
+            (N, d) float32 array of embeddings, in the same order as the input texts
+        """
+        data = orjson.dumps({
+            "model": self.model_name,
+            "input": texts
+        })
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                response = await client.post(self.base_url, content=data)
+                if response.status_code != 429 or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(2 ** attempt)
+
+        return self._parse_response(response, len(texts), out)
+
+    def _get_embedding(self, text: str) -> np.ndarray:
         """
         Get embedding for a single text.
 
@@ -47,41 +363,108 @@ class TogetherEmbeddings(Embeddings):
             text: Text to embed
 
         Returns:
-            List of embedding values
+            float32 array of embedding values
         """
+        return self._get_embeddings_batch([text])[0]
+
+    def _batch_slices(self, num_texts: int) -> List[slice]:
+        """Split the positions of num_texts texts into request-sized slices."""
+        return [
+            slice(start, min(start + self.batch_size, num_texts))
+            for start in range(0, num_texts, self.batch_size)
+        ]
+
+    async def _aembed_uncached(self, texts: List[str], out: np.ndarray) -> np.ndarray:
+        """
+        Asynchronously embed texts through the API.
+
+        All batches share one HTTP/2 connection, so they are multiplexed
+        without a TLS handshake per request.
+
+        Args:
+            texts: List of texts to embed
+            out: (N, d) float32 array to write the embeddings into
+
+        Returns:
+            out
+        """
+        # An AsyncClient is bound to the event loop it was first used on,
+        # so one client is opened per call and shared by all of its batches
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        semaphore = asyncio.Semaphore(self.max_workers)
+        async with httpx.AsyncClient(http2=True, headers=headers, timeout=60.0) as client:
+            await asyncio.gather(*[
+                self._aget_embeddings_batch(client, semaphore, texts[batch], out[batch])
+                for batch in self._batch_slices(len(texts))
+            ])
 
-        data = {
-            "model": self.model_name,
-            "input": text
-        }
+        return out
 
-        response = requests.post(self.base_url, headers=headers, json=data)
+    def _embed_uncached(self, texts: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Embed texts through the API.
 
-        if response.status_code != 200:
-            raise ValueError(f"Error from Together.ai API: {response.text}")
+        Texts are sent in batches of ``batch_size`` so that N chunks cost
+        ceil(N / batch_size) API round-trips instead of N, and the batches
+        are requested concurrently: over HTTP/2 when httpx[http2] is installed,
+        otherwise from a thread pool. Every batch writes its embeddings
+        straight into its slice of the output array.
+
+        Args:
+            texts: List of texts to embed
+            out: Optional (N, d) float32 array to write the embeddings into
+
+        Returns:
+            (N, d) float32 array of embeddings
+        """
+        if out is None:
+            out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+
+        batches = self._batch_slices(len(texts))
+        if len(batches) == 1:
+            self._get_embeddings_batch(texts, out)
+        elif len(batches) > 1:
+            if httpx is not None and not _event_loop_running():
+                return _run_async(self._aembed_uncached(texts, out))
 
-        result = response.json()
-        embedding = result["data"][0]["embedding"]
+            # The work is I/O-bound, so threads overlap the network latency
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                list(executor.map(
+                    lambda batch: self._get_embeddings_batch(texts[batch], out[batch]),
+                    batches
+                ))
 
-        return embedding
+        return out
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    async def aembed_documents(self, texts: List[str]) -> List[np.ndarray]:
         """
-        Embed a list of documents.
+        Asynchronously embed a list of documents.
 
         Args:
             texts: List of texts to embed
 
         Returns:
-            List of embeddings
+            List of float32 embedding arrays
         """
-        return [self._get_embedding(text) for text in texts]
+        if httpx is None:
+            return await super().aembed_documents(texts)
+
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        if self._cache is None:
+            return list(await self._aembed_uncached(texts, out))
 
-    def embed_query(self, text: str) -> List[float]:
+        keys, misses = self._fill_cached(texts, out)
+        if misses:
+            computed = np.empty((len(misses), self.dimensions), dtype=np.float32)
+            out[misses] = await self._aembed_uncached([texts[i] for i in misses], computed)
+            self._store_cached(keys, misses, out)
+
+        return list(out)
+
+    def embed_query(self, text: str) -> np.ndarray:
         """
         Embed a query.
 
@@ -89,14 +472,183 @@ class TogetherEmbeddings(Embeddings):
             text: Query to embed
 
         Returns:
-            Query embedding
+            Query embedding as a float32 array
         """
         return self._get_embedding(text)
 
+class LocalONNXEmbeddings(_ChunkCachedEmbeddings):
+    """Local sentence-transformers embeddings run through ONNX Runtime."""
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        provider: str = "CPUExecutionProvider",
+        batch_size: int = 64,
+        quantize: bool = True,
+        model_dir: str = ".onnx_models",
+        cache_dir: Optional[str] = ".embed_cache",
+    ):
+        """
+        Initialize local ONNX embeddings.
+
+        Args:
+            model_name: Hugging Face name of the sentence-transformers model
+            provider: ONNX Runtime execution provider (e.g. CUDAExecutionProvider)
+            batch_size: Number of texts encoded per forward pass
+            quantize: Run a dynamically INT8-quantized copy of the model, which
+                      is ~4x smaller and 2-4x faster on CPU
+            model_dir: Directory where exported and quantized models are kept
+            cache_dir: Directory for the per-chunk embedding cache (None disables it)
+        """
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+        except ImportError as e:
+            raise ImportError(
+                "Local embeddings require optimum with ONNX Runtime: "
+                "pip install optimum[onnxruntime]"
+            ) from e
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # Shared with DocumentLoader(tokenizer=model_name) through get_tokenizer
+        self.tokenizer = get_tokenizer(model_name)
+        # Used by DocumentLoader to keep chunks within the model's input;
+        # inputs are truncated at model_max_length including special tokens
+        self.tokenizer_name = model_name
+        self.max_tokens = self.tokenizer.model_max_length - self.tokenizer.num_special_tokens_to_add()
+
+        if quantize:
+            save_dir = self._quantized_model_dir(model_dir)
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                save_dir,
+                file_name="model_quantized.onnx",
+                provider=provider
+            )
+        else:
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name,
+                export=True,
+                provider=provider
+            )
+        self.dimensions = self.model.config.hidden_size
+
+        # Re-ingesting an unchanged document skips the forward passes; the
+        # quantized and full-precision models produce different vectors, so
+        # they are cached separately
+        precision = "int8" if quantize else "fp32"
+        self._cache = diskcache.Cache(cache_dir) if cache_dir and diskcache else None
+        self._cache_namespace = f"{self.model_name}:{precision}"
+
+        print(f"Using local ONNX embedding model: {self.model_name} ({provider}, {precision})")
+
+    def _quantized_model_dir(self, model_dir: str) -> str:
+        """
+        Export and INT8-quantize the model once, reusing it on later runs.
+
+        Args:
+            model_dir: Directory where exported and quantized models are kept
+
+        Returns:
+            Directory containing model_quantized.onnx
+        """
+        save_dir = os.path.join(model_dir, self.model_name.replace("/", "--"))
+        if os.path.exists(os.path.join(save_dir, "model_quantized.onnx")):
+            return save_dir
+
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        print(f"Quantizing {self.model_name} to INT8 (first run only)")
+        model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+        model.save_pretrained(save_dir)
+
+        # Dynamic quantization needs no calibration data; pick the kernel
+        # set matching this CPU
+        if platform.machine().lower() in ("arm64", "aarch64"):
+            qconfig = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+        elif _cpu_has_flag("avx512_vnni"):
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        else:
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+        ORTQuantizer.from_pretrained(model).quantize(save_dir=save_dir, quantization_config=qconfig)
+        return save_dir
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts with one forward pass.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            (N, d) float32 array of mean-pooled, L2-normalized embeddings
+        """
+        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+        hidden = self.model(**inputs).last_hidden_state
+
+        # Mean-pool over real tokens only, ignoring padding
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        # sentence-transformers models are trained for cosine similarity
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32, copy=False)
+
+    def _embed_uncached(self, texts: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Embed a list of texts with the model, bypassing the cache.
+
+        Texts are sorted by length before batching so each batch is only
+        padded to the length of its own longest text.
+
+        Args:
+            texts: List of texts to embed
+            out: Optional (N, d) float32 array to write the embeddings into
+
+        Returns:
+            (N, d) float32 array of embeddings
+        """
+        if out is None:
+            out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            out[batch] = self._embed_batch([texts[i] for i in batch])
+        return out
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a query.
+
+        Args:
+            text: Query to embed
+
+        Returns:
+            Query embedding as a float32 array
+        """
+        return self._embed_batch([text])[0]
+
 class EmbeddingManager:
     """Class for managing embeddings and vector stores."""
 
-    def __init__(self, embeddings=None, model_name=None, api_key=None):
+    def __init__(
+        self,
+        embeddings=None,
+        model_name=None,
+        api_key=None,
+        cache_dir=".vectorstore_cache",
+        index_type=None,
+        backend=None,
+        nlist=None,
+        pq_m=16,
+        pq_nbits=8,
+        nprobe=8,
+        hnsw_m=32,
+        ef_construction=200,
+        ef_search=64,
+    ):
         """
         Initialize with embedding model.
 
@@ -104,11 +656,64 @@ class EmbeddingManager:
             embeddings: Pre-configured embeddings instance (takes precedence if provided)
             model_name: Name of the embedding model to use (used if embeddings not provided)
             api_key: Together.ai API key
+            cache_dir: Directory under which vector stores are cached by document hash
+            index_type: FAISS index to build: "flat" (exact search), "hnsw",
+                        "ivfpq", "fp16" / "sq8" (exact search over float16 /
+                        int8-quantized vectors) or "auto" (HNSW, switching to
+                        IVF-PQ for very large corpora). Defaults to FAISS_INDEX_TYPE or "auto".
+            backend: Embedding backend, "together" (API) or "local" (ONNX
+                     Runtime). Defaults to EMBEDDING_BACKEND or "together".
+            nlist: Number of IVF cells (defaults to 4 * sqrt(N), at most N / 39)
+            pq_m: Number of PQ sub-quantizers; must divide the embedding size
+            pq_nbits: Bits per PQ sub-quantizer code
+            nprobe: Number of IVF cells visited per query
+            hnsw_m: Number of neighbors per node in the HNSW graph
+            ef_construction: HNSW candidate list size while building
+            ef_search: HNSW candidate list size per query (recall vs. latency)
         """
+        self.cache_dir = cache_dir
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+        # Vector stores whose index is a read-only view of a mapped file
+        self._mapped_stores = weakref.WeakSet()
+
+        # Build indexes on the GPU when faiss-gpu and a CUDA device are present
+        self._gpu_res = None
+        try:
+            if faiss.get_num_gpus() > 0:
+                self._gpu_res = faiss.StandardGpuResources()
+                print("Building FAISS indexes on GPU")
+        except AttributeError:
+            pass
+        self.index_type = (index_type or os.getenv("FAISS_INDEX_TYPE", "auto")).lower()
+        if self.index_type not in ("auto", "flat", "hnsw", "ivfpq", "sq8", "fp16"):
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type}")
+
+        self.backend = (backend or os.getenv("EMBEDDING_BACKEND", "together")).lower()
+        if self.backend not in ("together", "local"):
+            raise ValueError(f"Unsupported embedding backend: {self.backend}")
+
         # Use provided embeddings or create new ones
         if embeddings:
             self.embeddings = embeddings
             print(f"Using externally provided embeddings")
+        elif self.backend == "local":
+            self.model_name = model_name or os.getenv(
+                "LOCAL_EMBEDDING_MODEL",
+                "sentence-transformers/all-MiniLM-L6-v2"
+            )
+            quantize = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "1") == "1"
+            self.embeddings = _shared_embeddings(
+                ("local", self.model_name, quantize),
+                lambda: LocalONNXEmbeddings(model_name=self.model_name, quantize=quantize)
+            )
+            print(f"Created embeddings with model: {self.model_name}")
         else:
             # Get model name from environment or parameter
             self.model_name = model_name or os.getenv(
@@ -117,50 +722,264 @@ class EmbeddingManager:
             )
 
             # Create embeddings
-            self.embeddings = TogetherEmbeddings(
-                model_name=self.model_name,
-                api_key=api_key
+            self.embeddings = _shared_embeddings(
+                ("together", self.model_name, api_key),
+                lambda: TogetherEmbeddings(model_name=self.model_name, api_key=api_key)
             )
             print(f"Created embeddings with model: {self.model_name}")
 
-    def create_vector_store(self, documents):
+    def create_vector_store(self, documents, cache_key=None):
         """
         Create a vector store from documents.
 
+        If a cache key is given (e.g. a hash of the source file), the vector
+        store is persisted under ``cache_dir`` and reloaded from there on
+        later calls instead of re-embedding the documents, as long as the
+        chunks, the embedding model and the index configuration are also
+        unchanged (see _store_key).
+
         Args:
-            documents: List of Document objects
+            documents: List of Document objects (or SlimDoc records)
+            cache_key: Optional key identifying the source of the documents
 
         Returns:
             FAISS vector store
         """
-        vectorstore = FAISS.from_documents(documents, self.embeddings)
+        if cache_key:
+            directory = os.path.join(self.cache_dir, self._store_key(cache_key, documents))
+            if os.path.isdir(directory):
+                print(f"Loading cached vector store from {directory}")
+                # Mapped stores must only be added to through add_documents
+                return self.load_vector_store(directory, mmap=True)
+
+        # Embeddings are written straight into one preallocated matrix,
+        # normalized in place and added to the index without further copies
+        texts = [doc.page_content for doc in documents]
+        if hasattr(self.embeddings, "embed_documents_into"):
+            vectors = np.empty((len(texts), self.embeddings.dimensions), dtype=np.float32)
+            self.embeddings.embed_documents_into(texts, vectors)
+        else:
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+        # Normalize once so inner product equals cosine similarity
+        faiss.normalize_L2(vectors)
+
+        index = self._build_index(vectors)
+        self._set_search_params(index)
+        index = self._to_gpu(index)
+        if not index.is_trained:
+            # Train the quantizer on a sample of the corpus, large enough
+            # for k-means to see ~40 points per IVF cell
+            ivf = faiss.try_extract_index_ivf(index)
+            min_sample = 40 * ivf.nlist if ivf is not None else 0
+            sample_size = min(len(vectors), max(TRAINING_SAMPLE_SIZE, min_sample))
+            sample = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+            index.train(vectors[sample])
+        index.add(vectors)
+
+        ids = [str(uuid.uuid4()) for _ in documents]
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore({i: as_document(doc) for i, doc in zip(ids, documents)}),
+            index_to_docstore_id=dict(enumerate(ids)),
+            normalize_L2=True,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+
+        if cache_key:
+            self.save_vector_store(vectorstore, directory)
+
         return vectorstore
 
+    def _store_key(self, cache_key, documents):
+        """
+        Derive the cache directory name of a vector store.
+
+        Besides the caller's key, the name covers everything that shapes the
+        stored index: the chunk texts (and so the splitter settings), the
+        embedding model and its dimensions, and the index configuration.
+        Changing any of them builds a new store instead of loading a stale,
+        incompatible one.
+
+        Args:
+            cache_key: Key identifying the source of the documents
+            documents: List of Document objects to be indexed
+
+        Returns:
+            Hex digest naming the store under cache_dir
+        """
+        embeddings = self.embeddings
+        model = (
+            getattr(embeddings, "_cache_namespace", None)
+            or getattr(embeddings, "model_name", None)
+            or getattr(embeddings, "model", None)
+        )
+        digest = hashlib.sha256()
+        for part in (
+            cache_key,
+            type(embeddings).__name__,
+            model,
+            getattr(embeddings, "dimensions", None),
+            self.index_type,
+            self.nlist,
+            self.pq_m,
+            self.pq_nbits,
+            self.hnsw_m,
+            self.ef_construction,
+            len(documents),
+        ):
+            digest.update(f"{part}\0".encode())
+        for doc in documents:
+            digest.update(doc.page_content.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _build_index(self, vectors):
+        """
+        Build an empty FAISS index suited to the number of vectors.
+
+        All indexes rank by inner product over L2-normalized vectors, i.e.
+        by cosine similarity.
+
+        HNSW answers queries in roughly logarithmic time instead of scanning
+        every vector. IVF-PQ compresses vectors 8-32x and only scans the
+        nprobe cells nearest to the query; it is used for corpora too large
+        to keep as full-precision vectors, and below 10k vectors (where a
+        brute-force scan is cheap and PQ training is unreliable) it falls
+        back to an exact flat index. The scalar quantizers keep exact search
+        over compressed vectors: fp16 stores 2 bytes per dimension, halving
+        memory and scan bandwidth with practically no change in ranking,
+        and int8 stores 1 byte per dimension (4x smaller) at a small but
+        measurable recall loss.
+
+        Args:
+            vectors: (N, d) float32 array of embeddings to be indexed
+
+        Returns:
+            FAISS index (untrained for IVF-PQ)
+        """
+        num_vectors, dim = vectors.shape
+
+        index_type = self.index_type
+        if index_type == "auto":
+            index_type = "ivfpq" if num_vectors > 100_000 else "hnsw"
+        if index_type == "ivfpq" and num_vectors < 10_000:
+            index_type = "flat"
+
+        metric = faiss.METRIC_INNER_PRODUCT
+
+        if index_type == "flat":
+            return faiss.IndexFlatIP(dim)
+
+        if index_type == "sq8":
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+
+        if index_type == "fp16":
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, metric)
+
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, metric)
+            index.hnsw.efConstruction = self.ef_construction
+            return index
+
+        if dim % self.pq_m != 0:
+            raise ValueError(f"pq_m={self.pq_m} must divide the embedding size {dim}")
+
+        # k-means wants at least 39 training points per cell, which
+        # 4 * sqrt(N) exceeds below ~24k vectors
+        nlist = self.nlist or max(4, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, self.pq_m, self.pq_nbits, metric)
+
+    def _to_gpu(self, index):
+        """
+        Move an index to the GPU if one is available.
+
+        Index types without a GPU implementation (e.g. HNSW) stay on the CPU.
+
+        Args:
+            index: CPU FAISS index
+
+        Returns:
+            GPU copy of the index, or the index itself
+        """
+        if self._gpu_res is None:
+            return index
+        try:
+            return faiss.index_cpu_to_gpu(self._gpu_res, 0, index, faiss.GpuClonerOptions())
+        except RuntimeError as e:
+            print(f"Keeping {type(index).__name__} on CPU: {e}")
+            return index
+
+    def _set_search_params(self, index):
+        """Apply query-time search parameters to a built or loaded index."""
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = self.nprobe
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+
     def save_vector_store(self, vectorstore, directory="vectorstore"):
         """
         Save a vector store to disk.
 
         Args:
             vectorstore: FAISS vector store
-            directory: Directory to save the vector store
+            directory: Directory to save the vector store; an existing store
+                       there is replaced, any other non-empty directory is
+                       refused with FileExistsError
 
         Returns:
             Path to the saved vector store
         """
-        # Create directory if it doesn't exist
-        os.makedirs(directory, exist_ok=True)
+        # Write into a temporary sibling directory and move it into place,
+        # so an interrupted save never leaves a half-written store behind
+        # that later runs would mistake for a cache hit
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+
+        # GPU indexes cannot be serialized; save a CPU copy instead
+        index = vectorstore.index
+        if hasattr(faiss, "GpuIndex") and isinstance(index, faiss.GpuIndex):
+            vectorstore.index = faiss.index_gpu_to_cpu(index)
 
         # Save vector store
-        vectorstore.save_local(directory)
+        try:
+            vectorstore.save_local(tmp_dir)
+
+            # Only ever replace a store written by this method, never an
+            # unrelated directory (such as one holding other stores)
+            if os.path.isdir(directory) and os.listdir(directory):
+                if not os.path.isfile(os.path.join(directory, "index.faiss")):
+                    raise FileExistsError(f"{directory} exists and does not contain a vector store")
+                shutil.rmtree(directory)
+            os.replace(tmp_dir, directory)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            vectorstore.index = index
 
         return directory
 
-    def load_vector_store(self, directory="vectorstore"):
+    def load_vector_store(self, directory="vectorstore", mmap=False):
         """
         Load a vector store from disk.
 
         Args:
             directory: Directory containing the vector store
+            mmap: Memory-map the index file so that only the parts touched by
+                  queries are paged into RAM, instead of reading it whole.
+                  With faiss versions providing IO_FLAG_MMAP_IFC this covers
+                  every index type; older versions only map IVF inverted
+                  lists and read flat, HNSW and scalar-quantized indexes
+                  whole. Mapped indexes are read-only views, and faiss
+                  aborts the process on a direct add (e.g. the store's own
+                  add_documents), so this is off by default; add to a mapped
+                  store only through this manager's add_documents, which
+                  copies the index into RAM first.
 
         Returns:
             FAISS vector store
@@ -168,9 +987,103 @@ class EmbeddingManager:
         if not os.path.exists(directory):
             raise FileNotFoundError(f"Vector store directory {directory} not found")
 
-        vectorstore = FAISS.load_local(directory, self.embeddings)
+        io_flags = 0
+        if mmap and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            # Maps the vectors, graphs and inverted lists of every index type
+            io_flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+        elif mmap:
+            # Older faiss versions only map IVF inverted lists
+            io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(os.path.join(directory, "index.faiss"), io_flags)
+        self._set_search_params(index)
+
+        # The docstore is pickled by save_local; only directories written by
+        # this application are ever loaded here
+        with open(os.path.join(directory, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        # The index records its own metric: inner-product indexes hold
+        # L2-normalized vectors (cosine similarity), while stores built
+        # before the switch to cosine similarity use L2 distance
+        cosine = index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            normalize_L2=cosine,
+            distance_strategy=(
+                DistanceStrategy.MAX_INNER_PRODUCT if cosine else DistanceStrategy.EUCLIDEAN_DISTANCE
+            )
+        )
+        if mmap:
+            self._mapped_stores.add(vectorstore)
         return vectorstore
 
+    def add_documents(self, vectorstore, documents):
+        """
+        Add documents to an existing vector store.
+
+        Args:
+            vectorstore: FAISS vector store
+            documents: List of Document objects to add
+
+        Returns:
+            List of docstore ids of the added documents
+        """
+        self._make_writable(vectorstore)
+        return vectorstore.add_documents(documents)
+
+    def _make_writable(self, vectorstore):
+        """
+        Copy a memory-mapped index into RAM so that it can be added to.
+
+        Stores that were not loaded with mmap are left unchanged.
+
+        Args:
+            vectorstore: FAISS vector store
+        """
+        if vectorstore not in self._mapped_stores:
+            return
+        self._mapped_stores.discard(vectorstore)
+
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            # The whole index is a view of the mapped file; a serialization
+            # round trip gives it its own copy
+            vectorstore.index = faiss.deserialize_index(faiss.serialize_index(vectorstore.index))
+            self._set_search_params(vectorstore.index)
+        else:
+            self._load_invlists_into_memory(vectorstore.index)
+
+    def _load_invlists_into_memory(self, index):
+        """
+        Copy the inverted lists of a memory-mapped IVF index into RAM.
+
+        Indexes other than IVF, and IVF indexes that were not memory-mapped,
+        are left unchanged.
+
+        Args:
+            index: FAISS index
+        """
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is None:
+            return
+        invlists = faiss.downcast_InvertedLists(ivf.invlists)
+        if not isinstance(invlists, faiss.OnDiskInvertedLists):
+            return
+
+        in_memory = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+        for list_no in range(ivf.nlist):
+            list_size = invlists.list_size(list_no)
+            if list_size:
+                in_memory.add_entries(
+                    list_no, list_size,
+                    invlists.get_ids(list_no), invlists.get_codes(list_no)
+                )
+        ivf.replace_invlists(in_memory, True)
+        in_memory.this.disown()  # now owned by the index
+
     def print_vector_store_info(self, vectorstore, num_documents=None):
         """
         Print information about a vector store.
@@ -182,7 +1095,7 @@ class EmbeddingManager:
         print("\n" + "="*50)
         print("VECTOR STORE INFORMATION")
         print("="*50)
-        print(f"Vector store type: FAISS (local)")
+        print(f"Vector store type: FAISS (local, {type(vectorstore.index).__name__})")
         print(f"Embedding model: {self.model_name if hasattr(self, 'model_name') else 'Custom'}")
         if num_documents:
             print(f"Documents processed: {num_documents}")
@@ -1,32 +1,133 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    OnlinePDFLoader,
-    TextLoader,
-    Docx2txtLoader,
-    CSVLoader,
-    UnstructuredExcelLoader,
-    UnstructuredPowerPointLoader,
-    UnstructuredHTMLLoader
-)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from src.tasks.tokenization import get_tokenizer
+from src.tasks.documents import SlimDoc
+try:
+    # PyMuPDF extracts PDF text in C, much faster than pypdf
+    import fitz
+except ImportError:
+    fitz = None
 
 # Load environment variables
 load_dotenv()
 
+USE_PYMUPDF = os.getenv("USE_PYMUPDF", "1") == "1"
+
+# Lower-case file extension (without the dot) -> document type
+_EXT_TO_TYPE = {
+    'pdf': 'pdf',
+    'txt': 'txt', 'text': 'txt', 'md': 'txt', 'markdown': 'txt',
+    'docx': 'docx', 'doc': 'docx',
+    'csv': 'csv',
+    'xlsx': 'xlsx', 'xls': 'xlsx',
+    'pptx': 'pptx', 'ppt': 'pptx',
+    'html': 'html', 'htm': 'html',
+}
+
+# Relative paths are resolved against the project root
+_BASE_DIR = str(Path(__file__).parent.parent.parent)
+
+@lru_cache(maxsize=4096)
+def _resolve_path(file_path):
+    """Return file_path as an absolute path, relative paths being taken from the project root."""
+    if os.path.isabs(file_path):
+        return file_path
+    return os.path.join(_BASE_DIR, file_path)
+
+def _lazy_loader(class_name, **kwargs):
+    """
+    Return a factory for a LangChain document loader that is imported on first use.
+
+    The loaders pull in heavy dependencies (unstructured brings NLTK, PIL and
+    lxml), so each one is only imported when a document of its type is loaded.
+
+    Args:
+        class_name: Name of the loader class in langchain_community.document_loaders
+        **kwargs: Extra keyword arguments passed to the loader
+
+    Returns:
+        Function taking a file path or URL and returning the loader
+    """
+    def make_loader(path):
+        from langchain_community import document_loaders
+        return getattr(document_loaders, class_name)(path, **kwargs)
+    return make_loader
+
+# Document type -> loader factory taking the file path
+_TYPE_TO_LOADER = {
+    'pdf': _lazy_loader('PyPDFLoader'),
+    'txt': _lazy_loader('TextLoader', encoding='utf-8'),
+    'docx': _lazy_loader('Docx2txtLoader'),
+    'csv': _lazy_loader('CSVLoader'),
+    'xlsx': _lazy_loader('UnstructuredExcelLoader'),
+    'pptx': _lazy_loader('UnstructuredPowerPointLoader'),
+    'html': _lazy_loader('UnstructuredHTMLLoader'),
+}
+
+def _load_one_file(file_path):
+    """Load a single file; module-level so worker processes can unpickle it."""
+    return DocumentLoader().load_document(file_path)
+
 class DocumentLoader:
     """Class for loading and processing various document types."""
 
-    def __init__(self, chunk_size=500, chunk_overlap=50):
-        """Initialize with text splitting parameters."""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
+    def __init__(self, chunk_size=500, chunk_overlap=50, max_tokens=None, tokenizer=None, fast_split=False,
+                 embeddings=None):
+        """
+        Initialize with text splitting parameters.
+
+        Args:
+            chunk_size: Maximum number of characters per chunk, or of tokens
+                        when a tokenizer is given
+            chunk_overlap: Number of characters (or tokens) shared by
+                           consecutive chunks
+            max_tokens: Maximum number of tokens per chunk; longer chunks are
+                        re-split so the embedding model never truncates them.
+                        Defaults to the embeddings' limit, else 8000
+            tokenizer: Optional Hugging Face tokenizer, or the name of one, to
+                       measure chunk sizes in tokens. Passing the embedding
+                       model's tokenizer reuses the instance already loaded
+                       through get_tokenizer.
+            fast_split: Split by characters with FastCharSplitter, a compiled
+                        single-pass scan for very large documents, instead
+                        of RecursiveCharacterTextSplitter (ignored when a
+                        tokenizer is given)
+            embeddings: Embeddings the chunks are made for; their
+                        ``tokenizer_name`` and ``max_tokens`` attributes set
+                        the token limit (the default bert-base-uncased with
+                        8000 tokens only suits the Together.ai m2-bert models)
+        """
+        self.chunk_overlap = chunk_overlap
+        self.max_tokens = max_tokens or getattr(embeddings, "max_tokens", None) or 8000
+        self._limit_tokenizer_name = getattr(embeddings, "tokenizer_name", None)
+        # Tokenizer used by _limit_tokens, resolved on first use; False once
+        # loading it has failed, so it is not retried for every upload
+        self._limit_tokenizer = None
+        self.tokenizer = get_tokenizer(tokenizer) if isinstance(tokenizer, str) else tokenizer
+        if self.tokenizer is not None:
+            self.text_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+                self.tokenizer,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+        elif fast_split:
+            # Imported here so numba is only loaded when it is used
+            from src.tasks._numba_split import FastCharSplitter
+            self.text_splitter = FastCharSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+        else:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
 
-        )
+            )
 
     def load_document(self, file_path, file_type=None, verbose=False):
         """
@@ -41,51 +142,70 @@ class DocumentLoader:
         Returns:
             List of Document objects
         """
-        # Convert to absolute path if relative
-        if not os.path.isabs(file_path):
-            base_dir = Path(__file__).parent.parent.parent  # Go up to project root
-            file_path = os.path.join(base_dir, file_path)
+        file_path = _resolve_path(os.fspath(file_path))
 
         # Infer file type from extension if not provided
         if file_type is None:
-            file_extension = os.path.splitext(file_path)[1].lower()
-            if file_extension == '.pdf':
-                file_type = 'pdf'
-            elif file_extension in ['.txt', '.text', '.md', '.markdown']:
-                file_type = 'txt'
-            elif file_extension in ['.docx', '.doc']:
-                file_type = 'docx'
-            elif file_extension == '.csv':
-                file_type = 'csv'
-            elif file_extension in ['.xlsx', '.xls']:
-                file_type = 'xlsx'
-            elif file_extension in ['.pptx', '.ppt']:
-                file_type = 'pptx'
-            elif file_extension in ['.html', '.htm']:
-                file_type = 'html'
-            else:
-                raise ValueError(f"Unsupported file extension: {file_extension}")
+            file_type = _EXT_TO_TYPE.get(file_path.rpartition('.')[2].lower())
+            if file_type is None:
+                raise ValueError(f"Unsupported file extension: {os.path.splitext(file_path)[1]}")
 
         # Load document based on file type
-        if file_type == 'pdf':
-            loader = PyPDFLoader(file_path)
-        elif file_type == 'txt':
-            loader = TextLoader(file_path, encoding='utf-8')
-        elif file_type == 'docx':
-            loader = Docx2txtLoader(file_path)
-        elif file_type == 'csv':
-            loader = CSVLoader(file_path)
-        elif file_type == 'xlsx':
-            loader = UnstructuredExcelLoader(file_path)
-        elif file_type == 'pptx':
-            loader = UnstructuredPowerPointLoader(file_path)
-        elif file_type == 'html':
-            loader = UnstructuredHTMLLoader(file_path)
+        if file_type == 'pdf' and fitz is not None and USE_PYMUPDF:
+            documents = self._load_pdf_pymupdf(file_path)
         else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+            loader_cls = _TYPE_TO_LOADER.get(file_type)
+            if loader_cls is None:
+                raise ValueError(f"Unsupported file type: {file_type}")
+            documents = loader_cls(file_path).load()
 
-        # Load documents
-        documents = loader.load()
+        if verbose and documents:
+            self._print_document_info(documents)
+
+        return documents
+
+    def _load_pdf_pymupdf(self, pdf_path):
+        """
+        Load a PDF file with PyMuPDF, one Document per page.
+
+        Args:
+            pdf_path: Path to the PDF file
+
+        Returns:
+            List of Document objects with the same metadata as PyPDFLoader
+        """
+        with fitz.open(pdf_path) as pdf:
+            return [
+                Document(page_content=page.get_text("text"), metadata={"source": pdf_path, "page": i})
+                for i, page in enumerate(pdf)
+            ]
+
+    def load_many(self, paths, max_workers=None, verbose=False):
+        """
+        Load several documents in parallel worker processes.
+
+        Parsing (e.g. PDF text extraction) is CPU-bound pure Python, so
+        processes rather than threads are used to spread it across cores.
+
+        Args:
+            paths: Paths of the document files
+            max_workers: Number of worker processes (defaults to the CPU count)
+            verbose: Whether to print information about the loaded documents
+
+        Returns:
+            List of Document objects from all files, in the order of paths
+        """
+        paths = list(paths)
+        if len(paths) <= 1:
+            return [doc for path in paths for doc in self.load_document(path, verbose=verbose)]
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count(), len(paths))) as executor:
+            futures = {executor.submit(_load_one_file, path): i for i, path in enumerate(paths)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        documents = [doc for i in range(len(paths)) for doc in results[i]]
 
         if verbose and documents:
             self._print_document_info(documents)
@@ -96,6 +216,9 @@ class DocumentLoader:
         """
         Load a PDF file from a path.
 
+        Uses PyMuPDF when it is installed (set USE_PYMUPDF=0 to disable),
+        otherwise PyPDFLoader.
+
         Args:
             pdf_path: Path to the PDF file
             verbose: Whether to print information about the loaded PDF
@@ -116,7 +239,7 @@ class DocumentLoader:
         Returns:
             List of Document objects
         """
-        loader = OnlinePDFLoader(pdf_url)
+        loader = _lazy_loader('OnlinePDFLoader')(pdf_url)
         documents = loader.load()
 
         if verbose and documents:
@@ -134,12 +257,12 @@ class DocumentLoader:
             verbose: Whether to print information about the created document
 
         Returns:
-            List containing a single Document object
+            List containing a single SlimDoc record
         """
         if metadata is None:
             metadata = {"source": "user_input"}
 
-        document = Document(page_content=text, metadata=metadata)
+        document = SlimDoc(text, metadata)
         documents = [document]
 
         if verbose:
@@ -167,7 +290,7 @@ class DocumentLoader:
 
         try:
             # Use UnstructuredHTMLLoader to load the URL
-            loader = UnstructuredHTMLLoader(url)
+            loader = _TYPE_TO_LOADER['html'](url)
             documents = loader.load()
 
             if verbose and documents:
@@ -179,17 +302,82 @@ class DocumentLoader:
             # Return an empty document with the URL as content
             return self.load_from_text(f"Failed to load content from {url}: {str(e)}")
 
-    def split_documents(self, documents):
+    def split_documents(self, documents, start_id=0):
         """
         Split documents into chunks.
 
         Args:
             documents: List of Document objects
+            start_id: First ``chunk_id`` to assign; pass the number of chunks
+                      already in the vector store when adding to it, so ids
+                      stay unique across uploads
+
+        Returns:
+            List of split Document objects, each tagged with a ``chunk_id``
+            giving its position within the source documents and, when a
+            tokenizer is available, its token count as ``n_tokens``
+        """
+        chunks = self._limit_tokens(self.text_splitter.split_documents(documents))
+
+        # Stable ids let retrieval present chunks in document order
+        for chunk_id, chunk in enumerate(chunks, start_id):
+            chunk.metadata["chunk_id"] = chunk_id
+
+        return chunks
+
+    def _limit_tokens(self, chunks):
+        """
+        Count tokens per chunk and re-split chunks over ``max_tokens``.
+
+        Character-based chunk sizes only approximate token counts; this pass
+        tokenizes every chunk once so over-long chunks are split up-front
+        instead of being silently truncated by the embedding model.
+
+        Args:
+            chunks: List of split Document objects
 
         Returns:
-            List of split Document objects
+            List of Document objects within the token limit
         """
-        return self.text_splitter.split_documents(documents)
+        if self._limit_tokenizer is None:
+            try:
+                self._limit_tokenizer = self.tokenizer or (
+                    get_tokenizer(self._limit_tokenizer_name) if self._limit_tokenizer_name
+                    else get_tokenizer()
+                )
+            except Exception as e:
+                print(f"Tokenizer unavailable, skipping token counts: {e}")
+                self._limit_tokenizer = False
+        if self._limit_tokenizer is False:
+            return chunks
+        tokenizer = self._limit_tokenizer
+
+        counts = [
+            len(ids) for ids in
+            tokenizer([chunk.page_content for chunk in chunks], add_special_tokens=False)["input_ids"]
+        ]
+
+        limited = []
+        token_splitter = None
+        for chunk, n_tokens in zip(chunks, counts):
+            if n_tokens <= self.max_tokens:
+                chunk.metadata["n_tokens"] = n_tokens
+                limited.append(chunk)
+                continue
+
+            if token_splitter is None:
+                token_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+                    tokenizer,
+                    chunk_size=self.max_tokens,
+                    chunk_overlap=self.chunk_overlap
+                )
+            for piece in token_splitter.split_documents([chunk]):
+                piece.metadata["n_tokens"] = len(
+                    tokenizer.encode(piece.page_content, add_special_tokens=False)
+                )
+                limited.append(piece)
+
+        return limited
 
     def _print_document_info(self, documents):
         """Print information about the loaded documents."""
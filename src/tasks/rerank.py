@@ -0,0 +1,70 @@
+"""
+Cosine-similarity reranking of retrieved document chunks.
+"""
+
+import numpy as np
+try:
+    # JIT-compile the scoring loop when numba is installed
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def row_norms(mat):
+    """
+    Compute the L2 norm of every row of a matrix.
+
+    Args:
+        mat: (N, d) float32 array
+
+    Returns:
+        (N,) float32 array of row norms
+    """
+    return np.linalg.norm(mat, axis=1).astype(np.float32)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_scores(query, mat, norms):
+        """Cosine similarity of the query against every row of mat."""
+        query_norm = np.sqrt(np.sum(query * query))
+        scores = np.empty(mat.shape[0], dtype=np.float32)
+        for i in prange(mat.shape[0]):
+            dot = 0.0
+            for j in range(mat.shape[1]):
+                dot += mat[i, j] * query[j]
+            scores[i] = dot / (norms[i] * query_norm + 1e-12)
+        return scores
+else:
+    def _cosine_scores(query, mat, norms):
+        """Cosine similarity of the query against every row of mat."""
+        return (mat @ query) / (norms * np.linalg.norm(query) + 1e-12)
+
+
+def cosine_topk(query, mat, k, norms=None):
+    """
+    Find the k rows of a matrix most similar to a query vector.
+
+    Args:
+        query: (d,) query vector
+        mat: (N, d) matrix of candidate vectors
+        k: Number of results to return
+        norms: Optional precomputed row norms of mat (see row_norms)
+
+    Returns:
+        Tuple of (indices, scores) of the top k rows, best first
+    """
+    query = np.ascontiguousarray(query, dtype=np.float32)
+    mat = np.ascontiguousarray(mat, dtype=np.float32)
+    if norms is None:
+        norms = row_norms(mat)
+
+    scores = _cosine_scores(query, mat, norms)
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
@@ -2,6 +2,9 @@
 Together.ai integration for LLM functionality.
 """
 import os
+import asyncio
+import orjson
+import requests
 from dotenv import load_dotenv
 try:
     # Try to import from langchain-together first
@@ -13,6 +16,9 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+# Text completion endpoint, also used by the LangChain Together LLM
+COMPLETIONS_URL = "https://api.together.xyz/v1/completions"
+
 class TogetherAIManager:
     """Class for managing Together.ai models."""
 
@@ -37,6 +43,18 @@ class TogetherAIManager:
         # Set API key in environment for LangChain
         os.environ["TOGETHER_API_KEY"] = self.api_key
 
+        # LLM clients by (temperature, max_tokens), reused to skip rebuilding
+        # and validating them; the LangChain client still opens a new
+        # connection per request, only stream_text shares a session
+        self._llm_cache = {}
+
+        # Keep-alive session for streamed completions
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
     def get_llm(self, temperature=0.7, max_tokens=2048):
         """
         Get Together.ai LLM.
@@ -46,13 +64,17 @@ class TogetherAIManager:
             max_tokens: Maximum number of tokens to generate
 
         Returns:
-            Together LLM instance
+            Together LLM instance, shared by calls with the same parameters
         """
-        return Together(
-            model=self.model_name,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        key = (temperature, max_tokens)
+        llm = self._llm_cache.get(key)
+        if llm is None:
+            llm = self._llm_cache[key] = Together(
+                model=self.model_name,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        return llm
 
     def generate_text(self, prompt, temperature=0.7, max_tokens=2048):
         """
@@ -69,3 +91,89 @@ class TogetherAIManager:
         llm = self.get_llm(temperature=temperature, max_tokens=max_tokens)
         return llm.invoke(prompt)
 
+    def stream_text(self, prompt, temperature=0.7, max_tokens=2048):
+        """
+        Generate text using Together.ai, yielding it as it is produced.
+
+        The first tokens arrive long before the full completion, so callers
+        can start displaying the answer immediately. Use
+        "".join(stream_text(...)) where the whole string is needed.
+
+        Args:
+            prompt: Text prompt
+            temperature: Temperature for text generation
+            max_tokens: Maximum number of tokens to generate
+
+        Yields:
+            Chunks of generated text
+        """
+        # The LangChain Together LLM has no native streaming (stream() would
+        # yield the finished completion at once), so the server-sent events
+        # of the completions endpoint are read directly
+        data = orjson.dumps({
+            "model": self.model_name,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        })
+        with self._session.post(COMPLETIONS_URL, data=data, stream=True, timeout=60.0) as response:
+            if response.status_code != 200:
+                raise ValueError(f"Error from Together.ai API: {response.text}")
+
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                payload = line[len(b"data:"):].strip()
+                if payload == b"[DONE]":
+                    break
+                text = orjson.loads(payload)["choices"][0].get("text")
+                if text:
+                    yield text
+
+    async def agenerate_texts(self, prompts, temperature=0.7, max_tokens=2048, max_concurrency=8):
+        """
+        Generate text for several prompts concurrently.
+
+        Args:
+            prompts: List of text prompts
+            temperature: Temperature for text generation
+            max_tokens: Maximum number of tokens to generate
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            List of generated texts, in the order of prompts
+        """
+        llm = self.get_llm(temperature=temperature, max_tokens=max_tokens)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(prompt):
+            async with semaphore:
+                return await llm.ainvoke(prompt)
+
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts))
+
+    def generate_texts(self, prompts, temperature=0.7, max_tokens=2048, max_concurrency=8):
+        """
+        Generate text for several prompts concurrently.
+
+        Requests overlap their network latency instead of running one after
+        another, which pays off when evaluating many questions.
+
+        Args:
+            prompts: List of text prompts
+            temperature: Temperature for text generation
+            max_tokens: Maximum number of tokens to generate
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            List of generated texts, in the order of prompts
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.agenerate_texts(prompts, temperature, max_tokens, max_concurrency))
+
+        # Already inside an event loop: run the requests on worker threads
+        llm = self.get_llm(temperature=temperature, max_tokens=max_tokens)
+        return llm.batch(prompts, config={"max_concurrency": max_concurrency})
@@ -0,0 +1,28 @@
+"""
+Shared Hugging Face tokenizers.
+"""
+
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# m2-bert retrieval models use the bert-base-uncased vocabulary
+DEFAULT_TOKENIZER = os.getenv("EMBEDDING_TOKENIZER", "bert-base-uncased")
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name=DEFAULT_TOKENIZER):
+    """
+    Load a tokenizer once per process.
+
+    Args:
+        model_name: Hugging Face name of the tokenizer
+
+    Returns:
+        Fast (Rust-backed) tokenizer instance
+    """
+    # Imported lazily: transformers is only needed once text is tokenized
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)